@@ -1,16 +1,12 @@
 import sys
 
-import colorama
-import dotenv
-from colorama import Fore
-
-from neoudeler import UdemyDownloader
-
-colorama.init(autoreset=True)
+from neoudeler import Fore, UdemyDownloader, get_config
 
 
 def get_credentials_from_env():
-    return dotenv.get_key('.env', 'UDEMY_EMAIL'), dotenv.get_key('.env', 'UDEMY_PASSWORD')
+    # Config は .env を一度だけ読み込み、UdemyDownloader と共有されます
+    config = get_config()
+    return config.email, config.password
 
 
 def prompt_for_search_keyword():
@@ -24,6 +20,9 @@ def display_courses(subscribed_courses):
 
 
 def main():
+    import colorama
+    colorama.init(autoreset=True)
+
     email, password = get_credentials_from_env()
 
     if not email or not password:
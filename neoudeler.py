@@ -1,28 +1,92 @@
 from __future__ import annotations
 
+import atexit
 import dataclasses
 import datetime
 import enum
+import functools
+import hashlib
+import json
 import logging
 import os
+import queue
 import shutil
-from threading import Lock
+import sys
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from threading import BoundedSemaphore
+from typing import Iterator
 
-import colorama
-import dotenv
-import pathvalidate
 import requests
-from colorama import Fore
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util import Retry
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    # orjson が利用できない環境では標準ライブラリで代替します
+    from json import loads as json_loads
 
 logger = logging.getLogger(__name__)
 
-colorama.init(autoreset=True)
+# ログファイルへの書き込みは専用スレッドで行い、ダウンロード中のスレッドを待たせないようにします
+# logging.basicConfig と同様に、呼び出し元でログが設定済みの場合は何もしません
+if not logging.root.handlers:
+    _log_queue = queue.SimpleQueue()
+    _log_file_handler = logging.FileHandler('neo_udeler.log', delay=True)
+    _log_file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT, datefmt='%Y/%m/%d %H:%I:%S %p'))
+    _log_listener = QueueListener(_log_queue, _log_file_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    logging.root.addHandler(QueueHandler(_log_queue))
+    logging.root.setLevel(logging.ERROR)
+
+# ダウンロードで同時に使用するコネクション数の上限
+# 各スレッドの範囲分割ダウンロードを合わせても、接続プール(pool_maxsize)を超えないようにします
+MAX_DOWNLOAD_CONNECTIONS = 16
+_DOWNLOAD_SLOTS = BoundedSemaphore(MAX_DOWNLOAD_CONNECTIONS)
+
+# Udemy API へ同時に送信するリクエスト数の上限
+# 複数のコースを並列に取得する場合も、ページの取得はすべてこの上限を共有します
+MAX_API_CONNECTIONS = 16
+_API_SLOTS = BoundedSemaphore(MAX_API_CONNECTIONS)
+
+# ダウンロード時に一度に読み書きするバイト数
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# 範囲を分割して並列にダウンロードするファイルサイズの下限
+PARALLEL_RANGE_THRESHOLD = 16 << 20
+
+# response.raw からの読み込み中の切断やタイムアウトは、requests の例外に包まれずに送出されます
+_DOWNLOAD_ERRORS = (requests.RequestException, Urllib3HTTPError, OSError)
+
+# API レスポンスのキャッシュの保存先と有効期限(秒)
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'neoudeler')
+CACHE_TTL = 24 * 60 * 60
 
-logging.basicConfig(
-    filename='neo_udeler.log',
-    level=logging.ERROR,
-    datefmt='%Y/%m/%d %H:%I:%S %p',
-)
+# 最初のダウンロードまで読み込みを遅延させます(_sanitize_filename を参照)
+_pathvalidate = None
+
+# ファイル名に使用できない文字を削除し、パス区切り文字を全角スラッシュに置き換えます
+_SANITIZE_TABLE = str.maketrans({c: None for c in '<>:"|?*'} | {'/': '／', '\\': '／'})
+
+
+class Fore(object):
+    """
+    端末の文字色を変更する ANSI エスケープシーケンスです。
+
+    colorama.Fore と同じ値のため、Windows では colorama.init() の後に使用してください。
+    """
+    RED = '\x1b[31m'
+    YELLOW = '\x1b[33m'
+    BLUE = '\x1b[34m'
+    RESET = '\x1b[39m'
 
 
 class NeoUdelerError(Exception):
@@ -48,30 +112,315 @@ def check_response(response: requests.Response):
         raise NeoUdelerError(f'Error with status code: {response.status_code} at {response.url}')
 
 
-def download(url: str, path: str, chunking: bool = False):
+def _read_cache(cache_name: str) -> tuple[dict | None, bool]:
+    """
+    キャッシュ済みの API レスポンスを読み込みます。
+    :param cache_name: キャッシュ名
+    :return: キャッシュの内容(存在しない場合は None)と、有効期限内かどうか
+    """
+    path = os.path.join(CACHE_DIR, f'{cache_name}.json')
+    try:
+        with open(path, 'rb') as f:
+            cached = json_loads(f.read())
+        age = time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None, False
+    return cached, age < CACHE_TTL
+
+
+def _write_cache(cache_name: str, data: dict):
+    """
+    API レスポンスをキャッシュとして保存します。
+    :param cache_name: キャッシュ名
+    :param data: 保存する内容
+    :return:
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    with open(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(CACHE_DIR, f'{cache_name}.json'))
+
+
+def _touch_cache(cache_name: str):
+    os.utime(os.path.join(CACHE_DIR, f'{cache_name}.json'))
+
+
+def _read_json(response: requests.Response):
+    """
+    stream=True で取得したレスポンスのボディを JSON として読み込みます。
+
+    ボディは requests.Response に保持させず、パース後すぐに破棄します。
+    そのため、ボディとパース結果が同時にメモリ上に残るのはパース中のみです。
+    :param response: HTTP レスポンス
+    :return: JSON をパースした結果
+    """
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        body += chunk
+    data = json_loads(body)
+    del body
+    return data
+
+
+def fetch_paginated(url: str,
+                    params: dict,
+                    page_size: int = 200,
+                    max_workers: int = 8,
+                    cache_name: str | None = None,
+                    refresh: bool = False) -> tuple[int, list[dict]]:
+    """
+    ページ分割された Udemy API の結果を全ページ分取得します。
+
+    1ページ目の count から総ページ数を求め、残りのページは並列に取得します。
+    同時に送信するリクエスト数は、呼び出し元のスレッド数によらず MAX_API_CONNECTIONS までに制限します。
+    cache_name を指定した場合、結果を CACHE_DIR に保存し、有効期限内であれば API を呼び出しません。
+    有効期限切れの場合も、結果が 1ページに収まっていて ETag が一致すればキャッシュを使用します。
+    refresh を指定した場合はキャッシュを使用せずに取得し、取得結果でキャッシュを更新します。
+    :param url: API の URL
+    :param params: クエリパラメータ(page, page_size を除く)
+    :param page_size: 1ページあたりの件数
+    :param max_workers: 同時にリクエストを行うスレッド数
+    :param cache_name: キャッシュ名
+    :param refresh: キャッシュを使用せずに取得するかどうか
+    :return: 総件数と、ページ順に連結した results
     """
-    urlで指定したコンテンツを path に保存します。
+    cached, is_fresh = _read_cache(cache_name) if cache_name is not None and not refresh else (None, False)
+    if cached is not None and is_fresh:
+        return cached['count'], cached['results']
+
+    session = get_config().session
+
+    def fetch_page(page: int, headers: dict | None = None) -> tuple[requests.Response, dict | None]:
+        with _API_SLOTS, session.get(url,
+                                     params={**params, 'page_size': page_size, 'page': page},
+                                     headers=headers,
+                                     stream=True) as response:
+            if response.status_code == 304:
+                return response, None
+            check_response(response)
+            return response, _read_json(response)
+
+    # 1ページ目の ETag では 2ページ目以降の変更を検出できないため、複数ページの結果は再検証しません
+    can_revalidate = cached is not None and cached.get('etag') and cached['count'] <= page_size
+    headers = {'If-None-Match': cached['etag']} if can_revalidate else None
+    first_page, json_data = fetch_page(1, headers=headers)
+
+    if json_data is None:
+        _touch_cache(cache_name)
+        return cached['count'], cached['results']
+
+    count = json_data.get('count')
+    results = json_data.get('results')
+
+    pages = -(-count // page_size)
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _, page_data in executor.map(fetch_page, range(2, pages + 1)):
+                results.extend(page_data.get('results'))
+
+    if cache_name is not None:
+        _write_cache(cache_name, {'etag': first_page.headers.get('ETag'), 'count': count, 'results': results})
+
+    return count, results
+
+
+def download(url: str,
+             path: str | os.PathLike,
+             chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+             parallel_ranges: int = 4):
+    """
+    urlで指定したコンテンツを path にストリーミングで保存します。
+
+    取得したコンテンツの ETag は path に .etag を付けたファイルに記録します。
+    path が既に存在する場合、ETag とサイズが一致すればダウンロードを行わず、
+    ETag が一致して途中までしか保存されていなければ Range リクエストで続きから取得します。
     :param url: データ取得元URL
     :param path: 保存先ファイルパス
-    :param chunking: 分割ダウンロードを行うかどうか
+    :param chunk_size: 読み書きするバッファサイズ(バイト)
+    :param parallel_ranges: 大きなファイルを分割して並列に取得する範囲の数
     :return:
     """
-    response = requests.get(url, stream=chunking)
-    check_response(response)
-    with open(path, 'wb') as file:
-        if chunking:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    file.write(chunk)
+    session = get_config().session
+    use_ranges = parallel_ranges > 1
+    exists = os.path.exists(path)
+
+    head = session.head(url, allow_redirects=True) if exists or use_ranges else None
+
+    if exists:
+        size = os.path.getsize(path)
+        total = _content_length(head)
+        etag = head.headers.get('ETag')
+        saved_etag = _read_etag(path)
+
+        # ETag を記録していないファイルはサイズのみで判定します
+        if size == total and saved_etag in (None, etag):
+            return
+
+        if (saved_etag is not None and saved_etag == etag
+                and total is not None and size < total
+                and head.headers.get('Accept-Ranges') == 'bytes'):
+            if _resume_download(session, url, path, size, total, etag, chunk_size):
+                return
+
+    if use_ranges and _download_ranges(url, path, head, parallel_ranges, chunk_size):
+        _write_etag(path, head.headers.get('ETag'))
+        return
+
+    with _DOWNLOAD_SLOTS, session.get(url, stream=True) as response:
+        check_response(response)
+        # 中断された場合に続きから取得できるよう、書き込み前に ETag を記録します
+        _write_etag(path, response.headers.get('ETag'))
+        response.raw.decode_content = True
+        with open(path, 'wb') as file:
+            shutil.copyfileobj(response.raw, file, length=chunk_size)
+
+
+def _resume_download(session: requests.Session,
+                     url: str,
+                     path: str | os.PathLike,
+                     offset: int,
+                     total: int,
+                     etag: str,
+                     chunk_size: int) -> bool:
+    """
+    途中まで保存された path に、offset バイト目以降のコンテンツを追記します。
+
+    If-Range に etag を指定するため、コンテンツが更新されていた場合は全体を取得し直します。
+    Content-Range が offset から total までの範囲でない場合は、何も書き込まずに False を返します。
+    :param session: HTTP セッション
+    :param url: データ取得元URL
+    :param path: 保存先ファイルパス
+    :param offset: 保存済みのバイト数
+    :param total: HEAD リクエストで取得したファイルサイズ(バイト)
+    :param etag: 保存済みの部分の ETag
+    :param chunk_size: 読み書きするバッファサイズ(バイト)
+    :return: 続きから取得できたかどうか
+    """
+    headers = {'Range': f'bytes={offset}-', 'If-Range': etag}
+    with _DOWNLOAD_SLOTS, session.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 206:
+            content_range = response.headers.get('Content-Range', '')
+            if not (content_range.startswith(f'bytes {offset}-') and content_range.endswith(f'/{total}')):
+                write_log(response)
+                return False
+            mode = 'ab'
+            expected_size = total
         else:
-            file.write(response.content)
+            check_response(response)
+            _write_etag(path, response.headers.get('ETag'))
+            mode = 'wb'
+            expected_size = _content_length(response)
+
+        response.raw.decode_content = True
+        with open(path, mode) as file:
+            shutil.copyfileobj(response.raw, file, length=chunk_size)
+
+    # 途中で切断された場合に、次回の実行で完了済みと誤認しないよう確認します
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        raise NeoUdelerError(f'Incomplete download: {size} of {expected_size} bytes at {url}')
+    return True
+
+
+def _read_etag(path: str | os.PathLike) -> str | None:
+    try:
+        with open(f'{path}.etag', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
 
 
-def mkdir_unless_already_exists(dir_path: str):
-    if os.path.isdir(dir_path):
-        raise NeoUdelerError(f'{dir_path}: already exists')
+def _write_etag(path: str | os.PathLike, etag: str | None):
+    etag_path = f'{path}.etag'
+    if etag is None:
+        if os.path.exists(etag_path):
+            os.remove(etag_path)
+        return
 
-    os.mkdir(dir_path)
+    with open(etag_path, 'w', encoding='utf-8') as f:
+        f.write(etag)
+
+
+def _content_length(head: requests.Response) -> int | None:
+    """
+    HEAD リクエストのレスポンスから、保存されるファイルのサイズを返します。
+
+    圧縮されている場合は Content-Length と展開後のサイズが一致しないため None を返します。
+    :param head: HEAD リクエストのレスポンス
+    :return: ファイルサイズ(バイト)
+    """
+    if head.status_code != 200 or 'Content-Encoding' in head.headers:
+        return None
+
+    content_length = head.headers.get('Content-Length')
+    return int(content_length) if content_length is not None else None
+
+
+def _download_ranges(url: str,
+                     path: str | os.PathLike,
+                     head: requests.Response,
+                     parallel_ranges: int,
+                     chunk_size: int) -> bool:
+    """
+    Range リクエストでコンテンツを parallel_ranges 個に分割し、並列に path へ書き込みます。
+
+    サーバーが範囲指定に対応していない、またはファイルが小さい場合は何もせず False を返します。
+    範囲の取得に失敗した場合も False を返すため、呼び出し元は通常のダウンロードにフォールバックしてください。
+    :param url: データ取得元URL
+    :param path: 保存先ファイルパス
+    :param head: url への HEAD リクエストのレスポンス
+    :param parallel_ranges: 並列に取得する範囲の数
+    :param chunk_size: バッファサイズ(バイト)
+    :return: 範囲分割ダウンロードが完了したかどうか
+    """
+    if head.headers.get('Accept-Ranges') != 'bytes':
+        return False
+
+    total = _content_length(head)
+    if total is None or total < PARALLEL_RANGE_THRESHOLD:
+        return False
+
+    # 途中で中断された場合に完了済みと誤認しないよう、一時ファイルに書き込んでから置き換えます
+    part_path = f'{path}.part'
+    with open(part_path, 'wb') as file:
+        file.truncate(total)
+
+    step = -(-total // parallel_ranges)
+    ranges = [(start, min(start + step, total) - 1) for start in range(0, total, step)]
+
+    session = get_config().session
+
+    def fetch_range(start: int, end: int) -> bool:
+        try:
+            with _DOWNLOAD_SLOTS, session.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True) as response:
+                if response.status_code != 206:
+                    write_log(response)
+                    return False
+
+                with open(part_path, 'r+b') as file:
+                    file.seek(start)
+                    shutil.copyfileobj(response.raw, file, length=chunk_size)
+                    return file.tell() == end + 1
+        except _DOWNLOAD_ERRORS:
+            logger.exception(f'Failed to download bytes={start}-{end} of {url}')
+            return False
+
+    replaced = False
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(fetch_range, start, end) for start, end in ranges]
+            completed = all([future.result() for future in futures])
+
+        if completed:
+            os.replace(part_path, path)
+            replaced = True
+    finally:
+        # 例外が送出された場合も、書きかけの一時ファイルを残さないようにします
+        if not replaced:
+            os.remove(part_path)
+
+    return replaced
 
 
 class VideoFormat(enum.StrEnum):
@@ -117,7 +466,7 @@ class CourseContentType(enum.StrEnum):
     QUIZ = 'quiz'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Asset(object):
     """
     Udemy のコースを構成する
@@ -146,51 +495,69 @@ class Asset(object):
         return self.asset_type == AssetType.EXTERNAL_LINK
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Video(object):
     """
     Udemy の講義動画を表します。
     """
     video_format: VideoFormat
-    quality_label: str
+    # 画質(例: 720)。'auto' など数値でない場合は None です
+    quality_label: int | None
     file_url: str
 
 
-@dataclasses.dataclass
+def _parse_quality_label(label: str | None) -> int | None:
+    try:
+        return int(label)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class File(object):
     label: str
     file_url: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class StreamUrls(object):
     """
     レクチャーに紐づく動画のURLのリストを表します。
     """
     videos: list[Video]
 
-    def get_mp4_by_quality(self, quality: str):
+    def get_mp4_by_quality(self, quality: int) -> Video | None:
+        """
+        指定した画質の MP4 動画を返します。
+
+        該当する画質がない場合は最も高画質な MP4 動画を返します。
+        :param quality: 画質(例: 720)
+        :return: MP4 動画(MP4 動画が存在しない場合は None)
+        """
+        mp4 = VideoFormat.VIDEO_MPEG4
+        best_video = None
+        best_quality = -1
         for video in self.videos:
-            if not video.video_format.VIDEO_MPEG4:
+            if video.video_format is not mp4:
                 continue
 
             if video.quality_label == quality:
                 return video
 
-        self._get_mp4_highest_quality()
+            video_quality = video.quality_label if video.quality_label is not None else -1
+            if video_quality > best_quality or best_video is None:
+                best_quality = video_quality
+                best_video = video
 
-    def _get_mp4_highest_quality(self):
-        return [v for v in sorted(self.videos,
-                                  key=lambda v: v.quality_label,
-                                  reverse=True) if v.video_format == VideoFormat.VIDEO_MPEG4]
+        return best_video
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class DownloadUrls(object):
     files: list[File]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class SupplementaryAssets(object):
     """
     レクチャーに紐づく補足資料のリストを表します。
@@ -198,7 +565,7 @@ class SupplementaryAssets(object):
     supplementary_assets: list[Asset]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class CourseContent(object):
     """
     Udemyのコース(講座)を構成するコンテンツを表します。
@@ -221,7 +588,18 @@ class CourseContent(object):
         return self.course_content_type == CourseContentType.QUIZ
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
+class DownloadJob(object):
+    """
+    ダウンロードするファイルの取得元と保存先を表します。
+    """
+    url: str
+    path: Path
+    # 分割して並列に取得する範囲の数(1 の場合は分割しません)
+    parallel_ranges: int = 4
+
+
+@dataclasses.dataclass(slots=True)
 class Course(object):
     course_id: int
     title: str
@@ -229,241 +607,307 @@ class Course(object):
     image_480_270_url: str
     locale_title: str
     visible_instructors: list[Instructor]
+    _contents: list[CourseContent] | None = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _last_print: float = dataclasses.field(default=0.0, init=False, repr=False, compare=False)
+
+    _PROGRESS_LENGTH = 50
+    _PROGRESS_FILLED = '=' * _PROGRESS_LENGTH
+    _PROGRESS_EMPTY = ' ' * _PROGRESS_LENGTH
 
-    def fetch_all_contents(self) -> list[CourseContent]:
-        config = Config()
+    def fetch_all_contents(self, refresh: bool = False) -> list[CourseContent]:
+        if self._contents is not None and not refresh:
+            return self._contents
+
+        self._contents = parse_curriculum(self.course_id, self._fetch_curriculum_results(refresh=refresh))
+        return self._contents
+
+    def _fetch_curriculum_results(self, refresh: bool = False) -> list[dict]:
+        config = get_config()
 
         api_path = f'/api-2.0/courses/{self.course_id}/cached-subscriber-curriculum-items'
         params = {
-            'page_size': 100_000,
             'fields[asset]': 'title,description,data,body,asset_type,captions,download_urls,stream_urls',
             'fields[lecture]': 'title,description,asset,supplementary_assets',
         }
 
-        response = requests.get(config.udemy_base_url + api_path,
-                                params=params,
-                                cookies={'access_token': config.access_token})
-        check_response(response)
-
-        json_data = response.json()
-        results = json_data.get('results')
-
-        return self._create_course_contents_list(results)
-
-    def _create_course_contents_list(self, results: list[dict]) -> list[CourseContent]:
-        course_contents = []
-        for result in results:
+        _, results = fetch_paginated(config.udemy_base_url + api_path,
+                                     params=params,
+                                     cache_name=f'curriculum_{self.course_id}',
+                                     refresh=refresh)
+        return results
 
-            asset_results = result.get('asset')
-            if asset_results is not None:
-                asset = self._create_asset(asset_results)
-            else:
-                asset = None
-
-            supplementary_assets_results = result.get('supplementary_assets')
-            if supplementary_assets_results is not None:
-                supplementary_assets = self._create_supplementary_assets_list(supplementary_assets_results)
-            else:
-                supplementary_assets = None
-
-            course_contents.append(CourseContent(
-                course_id=self.course_id,
-                course_content_id=result.get('id'),
-                course_content_type=CourseContentType(result.get('_class')),
-                title=result.get('title'),
-                description=result.get('description'),
-                asset=asset,
-                supplementary_assets=supplementary_assets,
-            ))
-        return course_contents
+    @staticmethod
+    def _iter_course_contents(course_id: int,
+                              results: list[dict],
+                              content_types: set[CourseContentType] | None = None) -> Iterator[CourseContent]:
+        """
+        API レスポンスのコンテンツを順に CourseContent に変換します。
+
+        content_types を指定した場合、それ以外の種類のコンテンツはアセットを生成せずに読み飛ばします。
+        :param course_id: コースID
+        :param results: API レスポンスのコンテンツのリスト
+        :param content_types: 変換するコンテンツの種類
+        :return: CourseContent のイテレータ
+        """
+        _CourseContent = CourseContent
+        # EnumMeta.__call__ を経由せず、値から直接メンバーを引きます
+        course_content_types = CourseContentType._value2member_map_
+        create_asset = Course._create_asset
+        create_supplementary_assets_list = Course._create_supplementary_assets_list
 
-    def _create_supplementary_assets_list(self, results: list[dict]) -> SupplementaryAssets:
-        assets = []
         for result in results:
+            course_content_type = course_content_types[result['_class']]
+            if content_types is not None and course_content_type not in content_types:
+                continue
 
-            stream_urls_result = result.get('stream_urls')
-            if stream_urls_result is not None:
-                stream_urls = self._create_stream_urls(stream_urls_result)
-            else:
-                stream_urls = None
-
-            download_urls_result = result.get('download_urls')
-            if download_urls_result is not None:
-                download_urls = self._create_download_urls(download_urls_result)
-            else:
-                download_urls = None
-
-            assets.append(Asset(
-                asset_id=result.get('id'),
-                asset_type=AssetType(result.get('asset_type')),
+            yield _CourseContent(
+                course_id=course_id,
+                course_content_id=result['id'],
+                course_content_type=course_content_type,
                 title=result.get('title'),
                 description=result.get('description'),
-                body=result.get('body'),
-                stream_urls=stream_urls,
-                download_urls=download_urls,
-            ))
-        return SupplementaryAssets(supplementary_assets=assets)
-
-    def _create_asset(self, result: dict) -> Asset:
-        stream_urls_results = result.get('stream_urls')
-        if stream_urls_results is not None:
-            stream_urls = self._create_stream_urls(stream_urls_results)
-        else:
-            stream_urls = None
+                asset=create_asset(asset) if (asset := result.get('asset')) is not None else None,
+                supplementary_assets=(
+                    create_supplementary_assets_list(supplementary_assets)
+                    if (supplementary_assets := result.get('supplementary_assets')) is not None else None
+                ),
+            )
 
-        download_urls_results = result.get('download_urls')
-        if download_urls_results is not None:
-            download_urls = self._create_download_urls(download_urls_results)
-        else:
-            download_urls = None
+    @staticmethod
+    def _create_supplementary_assets_list(results: list[dict]) -> SupplementaryAssets:
+        create_asset = Course._create_asset
+        return SupplementaryAssets(supplementary_assets=[create_asset(result) for result in results])
 
-        asset = Asset(
-            asset_id=result.get('id'),
-            asset_type=AssetType(result.get('asset_type')),
+    @staticmethod
+    def _create_asset(result: dict) -> Asset:
+        """
+        API レスポンスのアセットから Asset を生成します。
+
+        レクチャー本体のアセットと補足資料のアセットは同じ形式のため、どちらもこのメソッドで生成します。
+        :param result: アセットを表す API レスポンス
+        :return: Asset
+        """
+        return Asset(
+            asset_id=result['id'],
+            asset_type=AssetType._value2member_map_[result['asset_type']],
             title=result.get('title'),
             description=result.get('description'),
             body=result.get('body'),
-            stream_urls=stream_urls,
-            download_urls=download_urls,
+            stream_urls=(
+                Course._create_stream_urls(stream_urls)
+                if (stream_urls := result.get('stream_urls')) is not None else None
+            ),
+            download_urls=(
+                Course._create_download_urls(download_urls)
+                if (download_urls := result.get('download_urls')) is not None else None
+            ),
         )
-        return asset
 
     @staticmethod
     def _create_stream_urls(result: dict) -> StreamUrls | None:
-        if result.get('Video') is None:
+        if (video_results := result.get('Video')) is None:
             return None
 
-        videos = []
-        for v in result.get('Video'):
-            videos.append(Video(
-                video_format=VideoFormat(v.get('type')),
-                quality_label=v.get('label'),
+        _Video = Video
+        video_formats = VideoFormat._value2member_map_
+        videos = [
+            _Video(
+                video_format=video_formats[v['type']],
+                quality_label=_parse_quality_label(v.get('label')),
                 file_url=v.get('file'),
-            ))
+            )
+            for v in video_results
+        ]
         return StreamUrls(videos=videos)
 
     @staticmethod
     def _create_download_urls(result: dict) -> DownloadUrls | None:
-        if result.get('File') is None:
+        if (file_results := result.get('File')) is None:
             return None
 
-        files = []
-        for f in result.get('File'):
-            files.append(File(
-                label=f.get('label'),
-                file_url=f.get('file'),
-            ))
+        _File = File
+        files = [_File(label=f.get('label'), file_url=f.get('file')) for f in file_results]
         return DownloadUrls(files=files)
 
-    def download_all_contents(self, dir_path: str) -> None:
+    def download_all_contents(self, dir_path: str, max_workers: int = 8) -> None:
+        """
+        コースの全コンテンツを dir_path 以下に保存します。
+
+        ディレクトリの作成は逐次行い、ダウンロードはスレッドプールで並列に実行します。
+        いずれかのダウンロードに失敗した場合は、残りのダウンロードを取り消して例外を送出します。
+        :param dir_path: 保存先ディレクトリ
+        :param max_workers: 同時にダウンロードを行うスレッド数
+        :return:
+        """
         today = datetime.datetime.today().strftime('%Y%m%d')
-        contents = self.fetch_all_contents()
 
-        instructor_names = []
-        for vi in self.visible_instructors:
-            instructor_names.append(f'{vi.display_name}')
+        # ダウンロード URL には有効期限があるため、キャッシュを使用せずに取得します
+        # 保存しないクイズはアセットを生成せずに読み飛ばします
+        results = self._fetch_curriculum_results(refresh=True)
+        contents = self._iter_course_contents(self.course_id,
+                                              results,
+                                              content_types={CourseContentType.CHAPTER, CourseContentType.LECTURE})
 
-        raw_dir_name = f'{today}_{self.title} - {",".join(instructor_names)}'
-        sanitized_dir_name = self._sanitize_filename(raw_dir_name)
+        instructor_names = ','.join(vi.display_name for vi in self.visible_instructors)
 
-        save_dir = os.path.join(dir_path, sanitized_dir_name)
+        # タイトルや講師名に含まれるパス区切り文字などは _sanitize_filename で置き換えます
+        raw_dir_name = f'{today}_{self.title} - {instructor_names}'
+        sanitized_dir_name = self._sanitize_filename(raw_dir_name)
 
-        if not os.path.isdir(save_dir):
-            os.mkdir(save_dir)
+        save_dir = Path(dir_path) / sanitized_dir_name
 
         chapter_number = 1
-        lecture_number = 1
 
-        total = len(contents)
-        dirname_prefix_digits = len(str(total))
-        chapter_dir = f'{str(0).zfill(dirname_prefix_digits)}_init'
-
-        for current, content in enumerate(contents, start=1):
-
-            self._print_progress(total=total, current=current)
+        dirname_prefix_digits = len(str(len(results)))
+        chapter_path = save_dir / f'{str(0).zfill(dirname_prefix_digits)}_init'
 
+        # 各コンテンツを保存するチャプターのディレクトリを求め、ダウンロード前にまとめて作成します
+        contents_with_paths: list[tuple[CourseContent, Path]] = []
+        required_dirs = {save_dir: None}
+        for content in contents:
             if content.is_chapter():
                 raw_chapter_dir = f'{str(chapter_number).zfill(dirname_prefix_digits)}_{content.title}'
-                chapter_dir = self._sanitize_filename(raw_chapter_dir)
-
-                if os.path.isdir(os.path.join(save_dir, chapter_dir)):
-                    shutil.rmtree(os.path.join(save_dir, chapter_dir))
+                chapter_path = save_dir / self._sanitize_filename(raw_chapter_dir)
+                chapter_number += 1
 
-                os.mkdir(os.path.join(save_dir, chapter_dir))
+            required_dirs[chapter_path] = None
+            contents_with_paths.append((content, chapter_path))
+
+        for required_dir in required_dirs:
+            required_dir.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # ジョブは見つかった順に投入し、残りのコンテンツを走査している間もダウンロードを進めます
+            futures = [executor.submit(download, job.url, job.path, parallel_ranges=job.parallel_ranges)
+                       for job in self._iter_download_jobs(contents_with_paths)]
+
+            total = len(futures)
+            for current, future in enumerate(as_completed(futures), start=1):
+                try:
+                    future.result()
+                except Exception:
+                    # 最初のエラーで中断し、未着手のダウンロードは取り消します
+                    # 実行中だったダウンロードは完了を待ち、失敗したものはログに記録します
+                    executor.shutdown(cancel_futures=True)
+                    for other in futures:
+                        if other is not future and not other.cancelled() and other.exception() is not None:
+                            logger.error('Download failed', exc_info=other.exception())
+                    raise
+
+                self._print_progress(total=total, current=current)
+
+        print('The course has been downloaded:', save_dir.absolute())
+
+    def _iter_download_jobs(self, contents_with_paths: list[tuple[CourseContent, Path]]) -> Iterator[DownloadJob]:
+        """
+        レクチャーの動画と補足資料のダウンロードジョブを、コンテンツの順に生成します。
+
+        記事(Article)はダウンロードを伴わないため、ジョブを生成せずにその場で保存します。
+        ジョブは並列に実行されるため、保存先が重複する場合は番号を付与して別のファイルにします。
+        :param contents_with_paths: コンテンツと、その保存先のチャプターのディレクトリ
+        :return: DownloadJob のイテレータ
+        """
+        lecture_number = 1
+        used_paths: set[Path] = set()
 
-                chapter_number += 1
+        for content, chapter_path in contents_with_paths:
 
             if content.is_lecture():
-                if content.asset.is_video():
-                    try:
-                        video = content.asset.stream_urls.get_mp4_by_quality('720')
-                        download(url=video.file_url,
-                                 path=os.path.join(
-                                     save_dir,
-                                     chapter_dir,
-                                     f'{lecture_number}_{self._sanitize_filename(content.title)}.mp4'),
-                                 chunking=True)
-                    except AttributeError:
-                        print(
-                            f'{Fore.BLUE}[{content.title}]{Fore.RESET} is not available for download.{Fore.RESET}')
-                        print(f'Number of lecture ({lecture_number}) may be DRM-protected... :(')
-
-                if content.asset.is_article():
-                    html = content.asset.body or content.asset.description
-                    with open(os.path.join(save_dir, chapter_dir, f'{content.title}.html'), 'w', encoding='utf-8') as f:
-                        f.write(html)
-
-                supplementary_assets = content.supplementary_assets.supplementary_assets
-                for supplementary_asset in supplementary_assets:
-
-                    if supplementary_asset.stream_urls is not None:
-
-                        videos = supplementary_asset.stream_urls.videos
-                        for num, video in enumerate(videos, start=1):
-                            download(url=video.file_url,
-                                     path=os.path.join(save_dir,
-                                                       chapter_dir,
-                                                       self._sanitize_filename(f'{supplementary_asset.title}')))
-
-                    if supplementary_asset.download_urls is not None:
-
-                        files = supplementary_asset.download_urls.files
-                        for num, file in enumerate(files, start=1):
-                            download(url=file.file_url,
-                                     path=os.path.join(save_dir,
-                                                       chapter_dir,
-                                                       self._sanitize_filename(f'{supplementary_asset.title}')),
-                                     chunking=False)
+                safe_title = self._sanitize_filename(content.title)
+
+                match content.asset:
+                    case Asset(asset_type=AssetType.VIDEO):
+                        try:
+                            video_url = content.asset.stream_urls.get_mp4_by_quality(720).file_url
+                        except AttributeError:
+                            print(
+                                f'{Fore.BLUE}[{content.title}]{Fore.RESET} is not available for download.{Fore.RESET}')
+                            print(f'Number of lecture ({lecture_number}) may be DRM-protected... :(')
+                        else:
+                            video_path = chapter_path / f'{lecture_number}_{safe_title}.mp4'
+                            yield DownloadJob(url=video_url, path=self._unique_path(video_path, used_paths))
+
+                    case Asset(asset_type=AssetType.ARTICLE):
+                        html = content.asset.body or content.asset.description
+                        (chapter_path / f'{safe_title}.html').write_text(html, encoding='utf-8')
+
+                if (supplementary_assets := content.supplementary_assets) is not None:
+                    for supplementary_asset in supplementary_assets.supplementary_assets:
+                        safe_asset_title = self._sanitize_filename(f'{supplementary_asset.title}')
+
+                        urls = []
+                        # 動画はレクチャー本体と同様に 1つの画質のみを保存します
+                        if (stream_urls := supplementary_asset.stream_urls) is not None:
+                            if (video := stream_urls.get_mp4_by_quality(720)) is not None:
+                                urls.append(video.file_url)
+
+                        if supplementary_asset.download_urls is not None:
+                            urls.extend(file.file_url for file in supplementary_asset.download_urls.files)
+
+                        # ファイル名が重複する場合は _unique_path で番号が付与されます
+                        # 補足資料は小さなファイルが多いため、範囲分割の判定(HEAD リクエスト)を行いません
+                        for url in urls:
+                            yield DownloadJob(url=url,
+                                              path=self._unique_path(chapter_path / safe_asset_title, used_paths),
+                                              parallel_ranges=1)
 
                 lecture_number += 1
 
-        print('The course has been downloaded:', os.path.abspath(save_dir))
+    @staticmethod
+    def _unique_path(path: Path, used_paths: set[Path]) -> Path:
+        """
+        used_paths に含まれない保存先を返し、used_paths に追加します。
+
+        path が使用済みの場合は、ファイル名の先頭に 2 から順に番号を付与します。
+        コンテンツの順序が同じであれば、再実行しても同じ保存先になります。
+        :param path: 保存先ファイルパス
+        :param used_paths: 使用済みの保存先
+        :return: 重複しない保存先ファイルパス
+        """
+        unique_path = path
+        num = 2
+        while unique_path in used_paths:
+            unique_path = path.with_name(f'{num}_{path.name}')
+            num += 1
+
+        used_paths.add(unique_path)
+        return unique_path
 
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
-        filename = pathvalidate.sanitize_filepath(filename)
+        global _pathvalidate
+        if _pathvalidate is None:
+            import pathvalidate
+            _pathvalidate = pathvalidate
 
-        invalid_chars = ['<', '>', ':', '"', '|', '?', '*']
-        for char in invalid_chars:
-            filename = filename.replace(char, '')
+        return _pathvalidate.sanitize_filepath(filename).translate(_SANITIZE_TABLE)
 
-        slash_chars = ['/', '\\']
-        for char in slash_chars:
-            filename = filename.replace(char, '／')
+    def _print_progress(self, total: int, current: int):
+        # 描画は 100ms に 1回まで間引きます(最後の 1回は必ず描画します)
+        now = time.monotonic()
+        is_completed = current == total
+        if now - self._last_print < 0.1 and not is_completed:
+            return
+        self._last_print = now
 
-        return filename
+        filled_length = (current * self._PROGRESS_LENGTH) // total
+        sys.stdout.write(f'{current * 100 / total:.2f} %: '
+                         f'[{self._PROGRESS_FILLED[:filled_length]}>{self._PROGRESS_EMPTY[filled_length:]}]\r')
+        if is_completed:
+            sys.stdout.flush()
 
-    @staticmethod
-    def _print_progress(total: int, current: int):
-        progress_length = 50
-        progress_percentage = (current / total) * 100
-        progress_bar_filled = '=' * int((current / total) * progress_length)
-        progress_bar_empty = ' ' * (progress_length - len(progress_bar_filled))
-        progress_bar = f"{progress_percentage:.2f} %: [{progress_bar_filled}>{progress_bar_empty}]"
-        print(progress_bar, end='\r')
+
+def parse_curriculum(course_id: int, results: list[dict]) -> list[CourseContent]:
+    """
+    API レスポンスのカリキュラムを CourseContent のリストに変換します。
+    :param course_id: コースID
+    :param results: API レスポンスのコンテンツのリスト
+    :return: CourseContent のリスト
+    """
+    return list(Course._iter_course_contents(course_id, results))
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Instructor(object):
     user_id: int
     title: str
@@ -474,7 +918,7 @@ class Instructor(object):
     user_url: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class SubscribedCourseList(object):
     """
     ユーザーが登録しているコースのリストを表します。
@@ -482,28 +926,16 @@ class SubscribedCourseList(object):
     search_keyword: str
     course_count: int
     courses: list[Course]
+    _courses_by_id: dict[int, Course] = dataclasses.field(init=False, repr=False, compare=False)
 
-    def find_course_by_course_id(self, course_id: int) -> Course | None:
-        for course in self.courses:
-            if course.course_id == course_id:
-                return course
-        return None
-
-
-class Singleton(type):
-    _unique_instance = None
-    _lock = Lock()
+    def __post_init__(self):
+        self._courses_by_id = {course.course_id: course for course in self.courses}
 
-    def __call__(cls, *args, **kwargs):
-        # Need to check if an instance exists in a thread-safe manner
-        if not cls._unique_instance:
-            with cls._lock:
-                if not cls._unique_instance:
-                    cls._unique_instance = super().__call__(*args, **kwargs)
-        return cls._unique_instance
+    def find_course_by_course_id(self, course_id: int) -> Course | None:
+        return self._courses_by_id.get(course_id)
 
 
-class Config(metaclass=Singleton):
+class Config(object):
     def __init__(self, env_path: str = '.env'):
         self._email = None
         self._password = None
@@ -513,11 +945,38 @@ class Config(metaclass=Singleton):
         self._env_path = env_path
         self._load_dotenv()
 
+        # スレッド間で共有し、コネクションを再利用します
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            # 再試行しきれなかった場合も最後のレスポンスを返し、check_response でエラーにします
+            max_retries=Retry(total=3,
+                              backoff_factor=0.3,
+                              status_forcelist=[429, 500, 502, 503, 504],
+                              raise_on_status=False),
+        ))
+        self._set_access_token_cookie()
+
     def _load_dotenv(self):
-        self._email = dotenv.get_key(self._env_path, 'UDEMY_EMAIL')
-        self._password = dotenv.get_key(self._env_path, 'UDEMY_PASSWORD')
-        self._sub_domain = dotenv.get_key(self._env_path, 'SUB_DOMAIN')
-        self._access_token = dotenv.get_key(self._env_path, 'ACCESS_TOKEN')
+        import dotenv
+
+        values = dotenv.dotenv_values(self._env_path)
+        self._email = values.get('UDEMY_EMAIL')
+        self._password = values.get('UDEMY_PASSWORD')
+        self._sub_domain = values.get('SUB_DOMAIN')
+        self._access_token = values.get('ACCESS_TOKEN')
+
+    def _set_access_token_cookie(self):
+        # Udemy のホストにのみ送信し、動画配信元(CDN)へのリクエストには付与しません
+        if self.access_token is None:
+            return
+        domain = urllib.parse.urlsplit(self.udemy_base_url).hostname
+        self._session.cookies.set('access_token', self.access_token, domain=domain)
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
 
     @property
     def udemy_base_url(self) -> str:
@@ -537,15 +996,29 @@ class Config(metaclass=Singleton):
 
     @access_token.setter
     def access_token(self, token: str):
+        import dotenv
+
         self._access_token = token
         dotenv.set_key(dotenv_path=self._env_path,
                        key_to_set='ACCESS_TOKEN',
                        value_to_set=token)
+        self._set_access_token_cookie()
+
+
+@functools.cache
+def get_config() -> Config:
+    """
+    モジュール全体で共有する唯一の Config を返します。
+
+    初回呼び出し以降はキャッシュ済みのインスタンスを返すため、ロックを取得しません。
+    :return: Config
+    """
+    return Config()
 
 
 class UdemyDownloader(object):
     def __init__(self):
-        self._config = Config()
+        self._config = get_config()
 
         if self._config.access_token is None:
             self._login_udemy()
@@ -554,7 +1027,7 @@ class UdemyDownloader(object):
 
     def _login_udemy(self):
         print('Login...')
-        response_get = requests.get(self._config.udemy_base_url)
+        response_get = self._config.session.get(self._config.udemy_base_url)
         check_response(response_get)
 
         csrf_token = response_get.cookies.get('csrftoken')
@@ -574,7 +1047,7 @@ class UdemyDownloader(object):
             'ud_locale': 'ja_JP',
         }
 
-        response_post = requests.post(post_url, data=payload, cookies=cookies, headers=headers)
+        response_post = self._config.session.post(post_url, data=payload, cookies=cookies, headers=headers)
         check_response(response_post)
 
         self._check_too_many_request_error(response_post)
@@ -583,7 +1056,7 @@ class UdemyDownloader(object):
 
     @staticmethod
     def _check_too_many_request_error(response: requests.Response):
-        err = response.json().get('error')
+        err = json_loads(response.content).get('error')
         if err is not None:
             write_log(response)
             raise NeoUdelerError('Login failed:', err.get('data').get('errors').get('__all__'))
@@ -591,59 +1064,96 @@ class UdemyDownloader(object):
     def _is_authenticated(self) -> bool:
         return self._config.access_token is not None
 
-    def fetch_subscribed_courses(self, search_keyword: str | None = None):
+    def fetch_subscribed_courses(self, search_keyword: str | None = None, refresh: bool = False):
         if not self._is_authenticated():
             raise NeoUdelerError('Not Authenticated')
 
         api_path = '/api-2.0/users/me/subscribed-courses'
         params = {
-            'page_size': 1000,
-            'page': 1,
             'fields[course]': '',
             'fields[user]': '',
         }
         if search_keyword is not None:
             params['search'] = search_keyword
 
-        response = requests.get(self._config.udemy_base_url + api_path,
-                                params=params,
-                                cookies={'access_token': self._config.access_token})
-        check_response(response)
-
-        json_data = response.json()
+        # 検索結果はユーザーごとに異なるため、ログイン情報も含めてキャッシュ名を決定します
+        cache_key = f'{self._config.udemy_base_url}|{self._config.email}|{search_keyword}'
+        cache_name = 'subscribed_courses_' + hashlib.sha1(cache_key.encode('utf-8')).hexdigest()
 
-        count = json_data.get('count')
-        results = json_data.get('results')
+        count, results = fetch_paginated(self._config.udemy_base_url + api_path,
+                                         params=params,
+                                         cache_name=cache_name,
+                                         refresh=refresh)
         courses = self._create_course_list(results)
 
         self._course_list = SubscribedCourseList(course_count=count, courses=courses, search_keyword=search_keyword)
         return self._course_list
 
+    def fetch_all_contents_for(self,
+                               course_ids: list[int],
+                               max_workers: int = 16,
+                               refresh: bool = False) -> dict[int, list[CourseContent]]:
+        """
+        複数のコースのコンテンツを並列に取得します。
+
+        コースは直前の fetch_subscribed_courses の結果から検索します。
+        API の呼び出しはスレッドで並列に行い、CourseContent への変換は取得後にこのプロセスで行います。
+        変換結果を別プロセスから受け渡すと、pickle のコストが変換そのものより大きくなるためです。
+        :param course_ids: コースIDのリスト
+        :param max_workers: 同時にリクエストを行うスレッド数
+        :param refresh: キャッシュを使用せずに取得するかどうか
+        :return: コースIDをキーとした各コースのコンテンツ
+        """
+        if self._course_list is None:
+            self.fetch_subscribed_courses()
+
+        courses = []
+        for course_id in course_ids:
+            course = self._course_list.find_course_by_course_id(course_id)
+            if course is None:
+                raise NeoUdelerError(f'Course not found: {course_id}')
+            courses.append(course)
+
+        pending = [course for course in courses if course._contents is None or refresh]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(functools.partial(Course._fetch_curriculum_results, refresh=refresh), pending))
+
+        for course, course_results in zip(pending, results):
+            course._contents = parse_curriculum(course.course_id, course_results)
+
+        return {course.course_id: course.fetch_all_contents() for course in courses}
+
     def _create_course_list(self, results: list[dict]) -> list[Course]:
-        courses: list[Course] = []
-        for result in results:
-            visible_instructors = self._create_visible_instructors_list(result.get('visible_instructors'))
+        _Course = Course
+        create_visible_instructors_list = self._create_visible_instructors_list
+        base_url = self._config.udemy_base_url
 
-            courses.append(Course(
-                course_id=result.get('id'),
+        return [
+            _Course(
+                course_id=result['id'],
                 title=result.get('title'),
-                url=self._config.udemy_base_url + result.get('url'),
+                url=base_url + result.get('url'),
                 image_480_270_url=result.get('image_480x270'),
                 locale_title=result.get('locale').get('title'),
-                visible_instructors=visible_instructors,
-            ))
-        return courses
+                visible_instructors=create_visible_instructors_list(result.get('visible_instructors')),
+            )
+            for result in results
+        ]
 
     def _create_visible_instructors_list(self, results: list[dict]) -> list[Instructor]:
-        visible_instructors = []
-        for result in results:
-            visible_instructors.append(Instructor(
-                user_id=result.get('id'),
+        _Instructor = Instructor
+        base_url = self._config.udemy_base_url
+
+        return [
+            _Instructor(
+                user_id=result['id'],
                 title=result.get('title'),
                 name=result.get('name'),
                 display_name=result.get('display_name'),
                 job_title=result.get('job_title'),
                 image_100_100=result.get('image_100x100'),
-                user_url=self._config.udemy_base_url + result.get('url'),
-            ))
-        return visible_instructors
+                user_url=base_url + result.get('url'),
+            )
+            for result in results
+        ]